@@ -1,17 +1,81 @@
 import speech_recognition as sr
 import threading
+import collections
 import queue
 import time
+import math
+import array
 import os
 import sys
 
-# Suppress ALSA warnings by redirecting stderr temporarily
+try:
+    import webrtcvad
+    WEBRTCVAD_AVAILABLE = True
+except ImportError:
+    WEBRTCVAD_AVAILABLE = False
+
+try:
+    import numpy as np
+    import sounddevice
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+    print("Warning: faster-whisper/sounddevice not available. Falling back to Google STT.")
+
+def _silence_alsa_errors():
+    """
+    Install a no-op ALSA error handler once at import time, silencing the
+    ALSA lib chatter at the source instead of repeatedly dup2-ing stderr
+    (4+ syscalls per suppression) around every audio call.
+    """
+    try:
+        import ctypes
+        handler_type = ctypes.CFUNCTYPE(
+            None, ctypes.c_char_p, ctypes.c_int,
+            ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p
+        )
+        noop = handler_type(lambda *args: None)
+        ctypes.CDLL("libasound.so.2").snd_lib_error_set_handler(noop)
+        # Keep a reference so the callback isn't garbage collected
+        _silence_alsa_errors._handler = noop
+    except Exception:
+        pass
+
+
+_silence_alsa_errors()
+
+
+def _boost_thread_priority():
+    """
+    Best-effort bump of the calling thread to (near) real-time priority so
+    audio capture is not preempted by face-recognition or LLM CPU spikes.
+    Silently degrades when the OS denies it (SCHED_FIFO needs CAP_SYS_NICE).
+    """
+    try:
+        if hasattr(os, 'sched_setscheduler'):
+            try:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+                return
+            except (OSError, PermissionError):
+                os.nice(-10)
+        elif sys.platform == 'win32':
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 15)  # TIME_CRITICAL
+    except Exception:
+        pass
+
+
+# Suppress remaining audio-backend chatter (JACK/PortAudio) by redirecting
+# stderr temporarily; only used around one-time initialization, never on the
+# per-phrase hot path
 class SuppressStderr:
     def __enter__(self):
         self.null_fds = [os.open(os.devnull, os.O_RDWR) for _ in range(2)]
         self.save_fds = [os.dup(2)]
         os.dup2(self.null_fds[0], 2)
-    
+
     def __exit__(self, *_):
         os.dup2(self.save_fds[0], 2)
         for fd in self.null_fds + self.save_fds:
@@ -21,82 +85,273 @@ class ASRListener:
     """
     A class to handle Automatic Speech Recognition (ASR) in a non-blocking way.
     Uses a background thread to continuously listen for speech input.
+    Prefers an on-device faster-whisper model (no network round-trip); falls
+    back to the Google Speech Recognition API when that is not installed.
     """
-    
+
+    # Streaming capture parameters (16 kHz mono int16, 20 ms frames)
+    SAMPLE_RATE = 16000
+    FRAME_SAMPLES = 320
+
     def __init__(self):
-        self.recognizer = sr.Recognizer()
-        
-        # Initialize microphone with suppressed stderr
-        with SuppressStderr():
-            self.microphone = sr.Microphone()
-        
         self.listening = False
-        self.text_queue = queue.Queue()
+        # Single-producer/single-consumer ring: deque append/popleft are
+        # atomic in CPython, so no lock sits between the real-time listen
+        # thread and the consumer; the Event only signals availability
+        self.text_queue = collections.deque(maxlen=64)
+        self._text_event = threading.Event()
+        self._on_text = None
         self.listen_thread = None
-        
-        # Adjust recognizer settings for better performance under CPU load
-        # Higher threshold to reduce false positives and speaker feedback
-        self.recognizer.energy_threshold = 6000  # Increased from 4000 to reduce speaker pickup
-        self.recognizer.dynamic_energy_threshold = True
-        self.recognizer.pause_threshold = 0.8  # Shorter pause threshold
-        
-        # Adjust for ambient noise on initialization
-        print("ASR: Calibrating microphone for ambient noise...")
-        with SuppressStderr():
-            with self.microphone as source:
-                self.recognizer.adjust_for_ambient_noise(source, duration=1)
-        print("ASR: Ready to listen!")
-    
+        self._mic_open = False
+
+        self.whisper_model = None
+        if FASTER_WHISPER_AVAILABLE:
+            try:
+                print("ASR: Loading faster-whisper model (base.en, int8)...")
+                self.whisper_model = WhisperModel("base.en", device="cpu", compute_type="int8")
+                self.audio_queue = queue.SimpleQueue()
+                print("ASR: On-device streaming recognizer ready!")
+            except Exception as e:
+                print(f"ASR: Could not load faster-whisper model: {e}")
+                self.whisper_model = None
+
+        if self.whisper_model is None:
+            # Fall back to the speech_recognition + Google STT pipeline
+            self.recognizer = sr.Recognizer()
+
+            # Two-stage speech gate (adaptive RMS + WebRTC VAD) to avoid
+            # sending non-speech audio (fan noise, clicks) to the STT API
+            self.vad = webrtcvad.Vad(3) if WEBRTCVAD_AVAILABLE else None
+            self._ema_rms = 200.0
+
+            # Initialize microphone with suppressed stderr
+            with SuppressStderr():
+                self.microphone = sr.Microphone()
+
+            # Adjust recognizer settings for better performance under CPU load
+            # Higher threshold to reduce false positives and speaker feedback
+            self.recognizer.energy_threshold = 6000  # Increased from 4000 to reduce speaker pickup
+            self.recognizer.dynamic_energy_threshold = True
+            self.recognizer.pause_threshold = 0.8  # Shorter pause threshold
+
+            # Adjust for ambient noise on initialization
+            print("ASR: Calibrating microphone for ambient noise...")
+            with SuppressStderr():
+                with self.microphone as source:
+                    self.recognizer.adjust_for_ambient_noise(source, duration=1)
+            print("ASR: Ready to listen!")
+
+    def _deliver_text(self, text):
+        """
+        Hand a recognized phrase to the consumer: through the on_text
+        callback when one was given to start_listening, otherwise through
+        the internal queue drained by get_text/wait_text.
+        """
+        if self._on_text is not None:
+            try:
+                self._on_text(text)
+            except Exception as e:
+                print(f"ASR: Error in on_text callback: {e}")
+        else:
+            self.text_queue.append(text)
+            self._text_event.set()
+
     def _listen_worker(self):
         """
         Worker function that runs in a background thread to listen for speech.
+        Dispatches to the on-device streaming recognizer when available.
+        """
+        _boost_thread_priority()
+        if self.whisper_model is not None:
+            self._listen_worker_stream()
+        else:
+            self._listen_worker_google()
+
+    def _tts_is_speaking(self):
+        """
+        Check whether the TTS module is currently playing audio (to avoid
+        transcribing our own speaker output).
+        """
+        try:
+            from tts import is_tts_speaking
+            return is_tts_speaking()
+        except ImportError:
+            return False
+
+    def _listen_worker_stream(self):
+        """
+        On-device streaming recognition: 20 ms PCM frames from the microphone
+        are pushed into a queue by the audio callback; phrases are segmented
+        here and transcribed locally with faster-whisper (no network leg).
+        """
+        frame_seconds = self.FRAME_SAMPLES / self.SAMPLE_RATE
+        silence_limit = 0.8   # seconds of silence that ends a phrase
+        max_phrase = 8.0      # hard cap on phrase length in seconds
+        onset_rms = 300.0     # int16 RMS level that marks speech onset
+
+        def _callback(indata, frames, time_info, status):
+            if self.listening:
+                self.audio_queue.put(bytes(indata))
+
+        with SuppressStderr():
+            stream = sounddevice.RawInputStream(
+                samplerate=self.SAMPLE_RATE,
+                blocksize=self.FRAME_SAMPLES,
+                dtype='int16',
+                channels=1,
+                callback=_callback
+            )
+            stream.start()
+        print("ASR: Listening (on-device streaming)...")
+
+        buffered = []
+        speech_started = False
+        silent_frames = 0
+        try:
+            while self.listening:
+                # Drop audio while TTS is speaking to avoid feedback loop.
+                # The capture callback keeps filling audio_queue meanwhile,
+                # so discard that backlog too: transcribing it after TTS
+                # finishes would feed our own speaker output back in
+                if self._tts_is_speaking():
+                    buffered = []
+                    speech_started = False
+                    silent_frames = 0
+                    try:
+                        while True:
+                            self.audio_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+                    time.sleep(0.2)
+                    continue
+
+                try:
+                    chunk = self.audio_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                samples = np.frombuffer(chunk, dtype=np.int16)
+                rms = float(np.sqrt(np.mean(samples.astype(np.float32) ** 2)))
+
+                if rms > onset_rms:
+                    speech_started = True
+                    silent_frames = 0
+                elif speech_started:
+                    silent_frames += 1
+
+                if speech_started:
+                    buffered.append(samples)
+
+                phrase_done = speech_started and (
+                    silent_frames * frame_seconds >= silence_limit
+                    or len(buffered) * frame_seconds >= max_phrase
+                )
+                if phrase_done:
+                    audio = np.concatenate(buffered).astype(np.float32) / 32768.0
+                    buffered = []
+                    speech_started = False
+                    silent_frames = 0
+
+                    segments, _ = self.whisper_model.transcribe(
+                        audio, vad_filter=True, beam_size=1, language="en"
+                    )
+                    text = " ".join(s.text.strip() for s in segments).strip()
+                    if text:
+                        print(f"ASR: Recognized: '{text}'")
+                        self._deliver_text(text)
+        finally:
+            stream.stop()
+            stream.close()
+
+    def _passes_speech_gate(self, audio):
+        """
+        Two-stage gate applied before the network STT call: each 30 ms frame
+        must beat an adaptive RMS threshold and pass WebRTC VAD. At least 60%
+        of frames must pass for the phrase to be forwarded. The RMS threshold
+        is an EMA updated on rejected frames only, so it tracks the noise
+        floor without being dragged up by speech.
+        """
+        if self.vad is None:
+            return True
+
+        raw = audio.get_raw_data(convert_rate=self.SAMPLE_RATE, convert_width=2)
+        frame_bytes = int(self.SAMPLE_RATE * 0.03) * 2  # 30 ms of int16
+        total = 0
+        passed = 0
+        for start in range(0, len(raw) - frame_bytes + 1, frame_bytes):
+            frame = raw[start:start + frame_bytes]
+            samples = array.array('h', frame)
+            rms = math.sqrt(sum(s * s for s in samples) / len(samples))
+            total += 1
+            if rms > self._ema_rms * 1.5 and self.vad.is_speech(frame, self.SAMPLE_RATE):
+                passed += 1
+            else:
+                self._ema_rms = 0.95 * self._ema_rms + 0.05 * rms
+        return total > 0 and passed / total >= 0.6
+
+    def _listen_worker_google(self):
+        """
+        Fallback recognition loop using the Google Speech Recognition API.
         """
         while self.listening:
             try:
                 # Check if TTS is speaking to avoid feedback loop
-                try:
-                    from tts import is_tts_speaking
-                    if is_tts_speaking():
-                        print("ASR: Pausing (TTS is speaking)...")
-                        time.sleep(0.5)
-                        continue
-                except ImportError:
-                    pass  # If tts module not available, continue normally
-                
-                with SuppressStderr():
-                    with self.microphone as source:
-                        # Listen for audio input with a timeout
-                        print("ASR: Listening...")
-                        audio = self.recognizer.listen(source, timeout=3, phrase_time_limit=5)
-                    
+                if self._tts_is_speaking():
+                    print("ASR: Pausing (TTS is speaking)...")
+                    time.sleep(0.5)
+                    continue
+
+                # The microphone stream is opened once in start_listening and
+                # stays open: re-opening it per phrase costs tens of ms on
+                # ALSA and risks glitches on rapid re-open
+                print("ASR: Listening...")
+                audio = self.recognizer.listen(self.microphone, timeout=3, phrase_time_limit=5)
+
+                # Reject non-speech phrases locally before paying for a
+                # network round-trip that would end in UnknownValueError
+                if not self._passes_speech_gate(audio):
+                    continue
+
                 try:
                     # Recognize speech using Google Speech Recognition
                     print("ASR: Processing audio...")
                     text = self.recognizer.recognize_google(audio)
                     print(f"ASR: Recognized: '{text}'")
-                    self.text_queue.put(text)
+                    self._deliver_text(text)
                 except sr.UnknownValueError:
                     print("ASR: Could not understand audio")
                 except sr.RequestError as e:
                     print(f"ASR: Could not request results; {e}")
-                    
+
             except sr.WaitTimeoutError:
                 # Timeout occurred, just continue listening
                 pass
             except Exception as e:
                 print(f"ASR: Error in listening loop: {e}")
                 time.sleep(1)  # Prevent rapid error loops
-    
-    def start_listening(self):
+
+    def start_listening(self, on_text=None):
         """
         Start listening for speech in a background thread.
+
+        Args:
+            on_text: Optional callable invoked with each recognized phrase
+                from the listen thread. When given, phrases bypass the
+                internal queue, so the consumer no longer needs to poll
+                has_text() on every iteration of its own loop.
         """
         if not self.listening:
+            self._on_text = on_text
+            if self.whisper_model is None and not self._mic_open:
+                # Open the microphone stream once for the whole session
+                with SuppressStderr():
+                    self.microphone.__enter__()
+                self._mic_open = True
             self.listening = True
             self.listen_thread = threading.Thread(target=self._listen_worker, daemon=True)
             self.listen_thread.start()
             print("ASR: Started listening in background")
-    
+
     def stop_listening(self):
         """
         Stop the background listening thread.
@@ -105,23 +360,44 @@ class ASRListener:
             self.listening = False
             if self.listen_thread:
                 self.listen_thread.join(timeout=2)
+            if self._mic_open:
+                self.microphone.__exit__(None, None, None)
+                self._mic_open = False
             print("ASR: Stopped listening")
-    
+
     def get_text(self):
         """
         Get recognized text from the queue if available.
         Returns None if no text is available.
         """
         try:
-            return self.text_queue.get_nowait()
-        except queue.Empty:
+            text = self.text_queue.popleft()
+        except IndexError:
             return None
-    
+        if not self.text_queue:
+            self._text_event.clear()
+            # The producer may have appended between the emptiness check
+            # and the clear; don't leave that item stranded with the event
+            # unset or wait_text() would block past it
+            if self.text_queue:
+                self._text_event.set()
+        return text
+
     def has_text(self):
         """
         Check if there is recognized text available in the queue.
         """
-        return not self.text_queue.empty()
+        return len(self.text_queue) > 0
+
+    def wait_text(self, timeout=None):
+        """
+        Block until recognized text is available (or the timeout expires).
+        Returns None on timeout. Preferred over polling has_text() in a
+        sleep loop, which wastes CPU and adds scheduling latency.
+        """
+        if not self._text_event.wait(timeout):
+            return None
+        return self.get_text()
 
 
 def recognize_speech_once():
@@ -130,25 +406,25 @@ def recognize_speech_once():
     Useful for standalone ASR testing.
     """
     recognizer = sr.Recognizer()
-    
+
     with SuppressStderr():
         microphone = sr.Microphone()
-    
+
         print("Adjusting for ambient noise... Please wait.")
         with microphone as source:
             recognizer.adjust_for_ambient_noise(source, duration=1)
-        
+
         print("Listening... Speak now!")
         with microphone as source:
             try:
                 audio = recognizer.listen(source, timeout=5, phrase_time_limit=10)
                 print("Processing audio...")
-                
+
                 # Recognize speech using Google Speech Recognition
                 text = recognizer.recognize_google(audio)
                 print(f"You said: {text}")
                 return text
-                
+
             except sr.WaitTimeoutError:
                 print("Listening timed out. No speech detected.")
                 return None
@@ -166,20 +442,19 @@ if __name__ == "__main__":
     result = recognize_speech_once()
     if result:
         print(f"Recognition successful: '{result}'")
-    
+
     print("\n\nTest 2: Continuous listening (non-blocking)")
     print("This will listen for 15 seconds. Press Ctrl+C to stop early.")
-    
+
     listener = ASRListener()
     listener.start_listening()
-    
+
     try:
         start_time = time.time()
         while time.time() - start_time < 15:
-            if listener.has_text():
-                text = listener.get_text()
+            text = listener.wait_text(timeout=0.5)
+            if text:
                 print(f">>> Received: '{text}'")
-            time.sleep(0.1)
     except KeyboardInterrupt:
         print("\nInterrupted by user")
     finally:
@@ -1,5 +1,7 @@
 import cv2
+import numpy as np
 import os
+import threading
 import time
 
 # Get the script directory and set dataset path relative to it
@@ -31,7 +33,9 @@ else:
     print(f"Adding image to existing person: {person_name}")
 
 # Count existing images for this person to create unique filename
-existing_images = [f for f in os.listdir(person_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
+with os.scandir(person_dir) as it:
+    existing_images = [e.name for e in it
+                       if e.is_file() and e.name.lower().endswith(('.jpg', '.jpeg', '.png'))]
 image_number = len(existing_images) + 1
 
 # File path for the new image
@@ -44,6 +48,25 @@ video_capture = cv2.VideoCapture(0)
 if not video_capture.isOpened():
     print("Error: Could not open webcam.")
 else:
+    # Request MJPG and a minimal driver buffer so frames arrive fresh
+    video_capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    # Grabber thread keeps only the newest decoded frame, so the main loop
+    # (overlay + imshow + waitKey) never blocks on camera decode and the
+    # auto-captured frame is always the most recent one
+    latest_frame = [None]
+    grabbing = True
+
+    def grab_loop():
+        while grabbing:
+            grabbed, grabbed_frame = video_capture.read()
+            if grabbed:
+                latest_frame[0] = grabbed_frame
+
+    grab_thread = threading.Thread(target=grab_loop, daemon=True)
+    grab_thread.start()
+
     print(f"\nWebcam opened. Instructions:")
     print("  - Press 'c' to capture the image")
     print("  - Press 'q' to quit without capturing")
@@ -52,33 +75,41 @@ else:
     start_time = time.time()
     capture_success = False
     timeout = 10  # seconds
+    frame = None
+    display = None
 
     while time.time() - start_time < timeout:
-        # Capture frame-by-frame
-        ret, frame = video_capture.read()
-        original_frame = frame.copy()
-        if not ret:
-            print("Error: Failed to grab frame.")
-            break
+        # Take the newest frame from the grabber thread
+        frame = latest_frame[0]
+        if frame is None:
+            time.sleep(0.01)
+            continue
+
+        # Draw the overlay into one preallocated scratch buffer instead of
+        # allocating a fresh full-frame copy every iteration; the clean
+        # frame stays untouched for saving
+        if display is None:
+            display = np.empty_like(frame)
+        np.copyto(display, frame)
 
         # Add text overlay showing remaining time and instructions
         remaining_time = int(timeout - (time.time() - start_time))
-        cv2.putText(frame, f"Press 'c' to capture | 'q' to quit", 
+        cv2.putText(display, f"Press 'c' to capture | 'q' to quit",
                     (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-        cv2.putText(frame, f"Auto-capture in: {remaining_time}s", 
+        cv2.putText(display, f"Auto-capture in: {remaining_time}s",
                     (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
-        cv2.putText(frame, f"Enrolling: {person_name}", 
+        cv2.putText(display, f"Enrolling: {person_name}",
                     (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
 
         # Display the resulting frame
-        cv2.imshow('Face Enrollment', frame)
+        cv2.imshow('Face Enrollment', display)
 
         # Wait for key press
         key = cv2.waitKey(1) & 0xFF
-        
+
         # 'c' key to capture
         if key == ord('c'):
-            cv2.imwrite(file_path, original_frame)
+            cv2.imwrite(file_path, frame)
             print(f"✓ Image saved to {file_path}")
             capture_success = True
             break
@@ -86,17 +117,21 @@ else:
         # 'q' key to quit
         elif key == ord('q'):
             print("Enrollment cancelled by user.")
+            grabbing = False
+            grab_thread.join(timeout=1)
             video_capture.release()
             cv2.destroyAllWindows()
             exit(0)
-    
-    if not capture_success and ret:
+
+    if not capture_success and frame is not None:
         # If time runs out, save the last frame automatically
         cv2.imwrite(file_path, frame)
         print(f"✓ Auto-captured! Image saved to {file_path}")
         capture_success = True
 
     # When everything is done, release the capture and destroy windows
+    grabbing = False
+    grab_thread.join(timeout=1)
     video_capture.release()
     cv2.destroyAllWindows()
     print("\nWebcam closed.")
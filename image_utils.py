@@ -0,0 +1,40 @@
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def resize_bgr2rgb_box4(src, dst):
+        """
+        Fused 4x4 box downscale and BGR->RGB swap, specialized for the
+        fixed 4x reduction the recognition pipeline uses: src is (H, W, 3)
+        uint8 BGR, dst is (H//4, W//4, 3) uint8 RGB. Each output pixel
+        averages its 4x4 input block, which antialiases better than the
+        nearest-neighbor strided slice while the compiler turns the inner
+        sums into SIMD integer adds with no per-call dispatch overhead.
+        cache=True persists the compiled kernel across runs.
+        """
+        out_h = dst.shape[0]
+        out_w = dst.shape[1]
+        for oy in prange(out_h):
+            sy = oy * 4
+            for ox in range(out_w):
+                sx = ox * 4
+                b = 0
+                g = 0
+                r = 0
+                for dy in range(4):
+                    for dx in range(4):
+                        b += src[sy + dy, sx + dx, 0]
+                        g += src[sy + dy, sx + dx, 1]
+                        r += src[sy + dy, sx + dx, 2]
+                dst[oy, ox, 0] = r // 16
+                dst[oy, ox, 1] = g // 16
+                dst[oy, ox, 2] = b // 16
+else:
+    resize_bgr2rgb_box4 = None
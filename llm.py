@@ -4,38 +4,95 @@ Handles conversations with unknown intruders using a language model.
 """
 
 import os
+import re
 import threading
 import queue
 import time
 from typing import Optional, List, Dict
 
 try:
-    from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
+    from llama_cpp import Llama
+    LLAMA_CPP_AVAILABLE = True
+except ImportError:
+    LLAMA_CPP_AVAILABLE = False
+
+try:
+    from transformers import AutoTokenizer, AutoModelForCausalLM, TextIteratorStreamer
     import torch
     TRANSFORMERS_AVAILABLE = True
 except ImportError:
     TRANSFORMERS_AVAILABLE = False
     print("Warning: transformers not available. LLM features will be limited.")
 
+# Default quantized chat model for the llama.cpp backend (Q4_0 weights are
+# ~8x denser than FP32, which matters for memory-bandwidth-bound decoding)
+DEFAULT_GGUF_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "qwen2.5-0.5b-instruct-q4_0.gguf"
+)
+
+# Rule table for the fallback responder: keyword sets and their canned
+# replies, compiled once into one regex per rule so dispatch is a single
+# pass over the text instead of repeated substring scans
+FALLBACK_RULE_TABLE = [
+    # Greetings
+    (['hello', 'hi', 'hey'],
+     "Hello. This is a restricted area. Who are you and why are you here?"),
+    # Identification attempts
+    (['name is', 'i am', "i'm", 'my name'],
+     "I see. Do you have authorization to be in this area? Can you provide a code or badge number?"),
+    # Authorization claims
+    (['authorized', 'permission', 'allowed', 'badge'],
+     "Please wait here while I verify your credentials. Security has been notified."),
+    # Hostility or refusal
+    (['no', 'none', 'leave me', 'mind your'],
+     "I must inform you that this area is under surveillance. Please comply or leave immediately."),
+    # Confusion
+    (['what', 'where', 'who', 'confused', 'lost'],
+     "You are in a restricted area. If you are lost, please leave the way you came and contact security."),
+]
+
+_COMPILED_FALLBACK_RULES = [
+    (re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")\b", re.IGNORECASE), response)
+    for words, response in FALLBACK_RULE_TABLE
+]
+
 
 class IntruderConversationManager:
     """
     Manages conversations with intruders using an LLM.
     """
     
-    def __init__(self, model_name: str = "facebook/opt-125m"):
+    def __init__(self, model_name: str = "facebook/opt-125m", gguf_path: str = DEFAULT_GGUF_PATH):
         """
         Initialize the conversation manager.
-        
+
         Args:
             model_name: The huggingface model to use for conversation.
                        Default is a small model that can run on CPU.
+            gguf_path: Path to a quantized GGUF chat model. When llama.cpp is
+                      installed and this file exists, it is preferred over
+                      the huggingface pipeline for faster CPU inference.
         """
         self.conversation_active = False
         self.conversation_history: List[Dict[str, str]] = []
         self.response_queue = queue.Queue()
         self.model_name = model_name
-        self.generator = None
+        self.gguf_path = gguf_path
+        self.model = None
+        self.tokenizer = None
+        self.llama = None
+
+        # Incremental decoding state for the huggingface path: attention
+        # keys/values and token ids of everything generated so far, so each
+        # turn only encodes the new message instead of the whole history
+        self._past_key_values = None
+        self._past_ids = None
+
+        # Rolling prompt fragments, appended per turn and joined only when
+        # the prompt must be rebuilt from scratch (first turn or after a
+        # KV-cache reset) instead of re-concatenating the history each call
+        self._prompt_parts: List[str] = []
         
         # System prompt for the intruder conversation
         self.system_prompt = """You are a security AI assistant. An unknown person has been detected in a restricted area. 
@@ -51,63 +108,68 @@ Keep responses SHORT (1-2 sentences max) and conversational. Be direct and clear
     
     def _initialize_model(self):
         """
-        Initialize the LLM model.
+        Initialize the LLM model. Prefers a quantized llama.cpp model (int4
+        weights, int8 CPU matmuls), falling back to the huggingface pipeline
+        and finally to rule-based responses.
         """
+        if LLAMA_CPP_AVAILABLE and os.path.exists(self.gguf_path):
+            try:
+                print(f"LLM: Loading quantized model '{os.path.basename(self.gguf_path)}'...")
+                self.llama = Llama(
+                    model_path=self.gguf_path,
+                    n_ctx=512,
+                    n_threads=os.cpu_count(),
+                    verbose=False
+                )
+                print("LLM: Quantized model loaded successfully!")
+                return
+            except Exception as e:
+                print(f"LLM: Error loading quantized model: {e}")
+                self.llama = None
+
         if not TRANSFORMERS_AVAILABLE:
             print("LLM: Transformers not available. Using fallback responses.")
             return
-        
+
         try:
             print(f"LLM: Loading model '{self.model_name}'...")
             # Use a smaller, faster model for real-time conversation
-            self.generator = pipeline(
-                'text-generation',
-                model=self.model_name,
-                device=-1,  # CPU
-                max_length=150,
-                do_sample=True,
-                temperature=0.7,
-                top_p=0.9
-            )
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
+            self.model.eval()
             print("LLM: Model loaded successfully!")
         except Exception as e:
             print(f"LLM: Error loading model: {e}")
             print("LLM: Falling back to rule-based responses.")
-            self.generator = None
+            self.model = None
+            self.tokenizer = None
+
+    def _reset_kv_cache(self):
+        """
+        Drop the incremental decoding state (next turn re-encodes from the
+        system prompt).
+        """
+        self._past_key_values = None
+        self._past_ids = None
     
-    def _get_fallback_response(self, intruder_text: str) -> str:
+    def _get_fallback_response(self, intruder_text: str):
         """
-        Get a fallback response when LLM is not available.
-        Uses rule-based logic.
+        Get a rule-based response and a confidence score. Rule hits are
+        confident (1.0) and can be used instead of running the LLM; the
+        generic turn-count responses are low confidence (0.2).
         """
-        intruder_lower = intruder_text.lower()
-        
         # Check conversation turn count
         turn_count = len([m for m in self.conversation_history if m['role'] == 'intruder'])
-        
+
         if turn_count == 0:
-            return "Hello, I've detected your presence. Can you please identify yourself?"
-        
-        # Check for greetings
-        if any(word in intruder_lower for word in ['hello', 'hi', 'hey']):
-            return "Hello. This is a restricted area. Who are you and why are you here?"
-        
-        # Check for identification attempts
-        if any(word in intruder_lower for word in ['name is', 'i am', "i'm", 'my name']):
-            return "I see. Do you have authorization to be in this area? Can you provide a code or badge number?"
-        
-        # Check for authorization claims
-        if any(word in intruder_lower for word in ['authorized', 'permission', 'allowed', 'badge']):
-            return "Please wait here while I verify your credentials. Security has been notified."
-        
-        # Check for hostility or refusal
-        if any(word in intruder_lower for word in ['no', 'none', 'leave me', 'mind your']):
-            return "I must inform you that this area is under surveillance. Please comply or leave immediately."
-        
-        # Check for confusion
-        if any(word in intruder_lower for word in ['what', 'where', 'who', 'confused', 'lost']):
-            return "You are in a restricted area. If you are lost, please leave the way you came and contact security."
-        
+            return "Hello, I've detected your presence. Can you please identify yourself?", 1.0
+
+        # Single pass over the precompiled rules; each rule's keywords were
+        # merged into one alternation regex at import time
+        for pattern, response in _COMPILED_FALLBACK_RULES:
+            if pattern.search(intruder_text):
+                return response, 1.0
+
         # Default responses based on turn count
         responses = [
             "I need you to identify yourself. Who are you?",
@@ -116,16 +178,34 @@ Keep responses SHORT (1-2 sentences max) and conversational. Be direct and clear
             "Security has been alerted. Please remain where you are.",
             "I'm waiting for your response. Why are you in this restricted area?"
         ]
-        
-        return responses[min(turn_count - 1, len(responses) - 1)]
+
+        return responses[min(turn_count - 1, len(responses) - 1)], 0.2
     
-    def _generate_response(self, intruder_text: str) -> str:
+    @staticmethod
+    def _flush_sentences(buffer: str, on_sentence) -> str:
+        """
+        Emit any complete sentences in the buffer through the callback and
+        return the unemitted remainder.
+        """
+        while True:
+            boundary = re.search(r'[.!?](\s|$)', buffer)
+            if not boundary:
+                return buffer
+            sentence = buffer[:boundary.end()].strip()
+            if sentence:
+                on_sentence(sentence)
+            buffer = buffer[boundary.end():]
+
+    def _generate_response(self, intruder_text: str, on_sentence=None) -> str:
         """
         Generate a response to the intruder using the LLM or fallback logic.
-        
+
         Args:
             intruder_text: What the intruder said
-            
+            on_sentence: Optional callback invoked with each completed
+                        sentence as tokens stream out, so TTS can start
+                        speaking before generation finishes
+
         Returns:
             The AI's response
         """
@@ -134,44 +214,157 @@ Keep responses SHORT (1-2 sentences max) and conversational. Be direct and clear
             'role': 'intruder',
             'content': intruder_text
         })
-        
-        # Use fallback if model not available
-        if self.generator is None:
-            response = self._get_fallback_response(intruder_text)
-        else:
+
+        spoke_streamed = False
+
+        # Run the cheap rule-based classifier first: on a confident hit
+        # there is no point paying for LLM generation at all
+        fallback_response, fallback_confidence = self._get_fallback_response(intruder_text)
+
+        if fallback_confidence >= 0.9 or (self.llama is None and self.model is None):
+            response = fallback_response
+            # The huggingface KV cache does not see this exchange, so drop
+            # it; the next turn re-encodes from _prompt_parts, which does
+            # include the rule-answered turns
+            self._reset_kv_cache()
+        elif self.llama is not None:
             try:
-                # Build conversation context
-                conversation_text = self.system_prompt + "\n\n"
+                messages = [{'role': 'system', 'content': self.system_prompt}]
                 for msg in self.conversation_history[-6:]:  # Last 3 exchanges
-                    if msg['role'] == 'intruder':
-                        conversation_text += f"Intruder: {msg['content']}\n"
-                    else:
-                        conversation_text += f"Security AI: {msg['content']}\n"
-                conversation_text += "Security AI:"
-                
-                # Generate response
-                outputs = self.generator(
-                    conversation_text,
+                    role = 'user' if msg['role'] == 'intruder' else 'assistant'
+                    messages.append({'role': role, 'content': msg['content']})
+
+                if on_sentence is not None:
+                    # Stream tokens and hand completed sentences to TTS so
+                    # audio starts at the first sentence, not after the
+                    # whole reply is generated
+                    buffer = ""
+                    pieces = []
+                    for chunk in self.llama.create_chat_completion(
+                        messages=messages,
+                        max_tokens=50,
+                        temperature=0.7,
+                        top_p=0.9,
+                        stream=True
+                    ):
+                        delta = chunk['choices'][0]['delta'].get('content', '')
+                        if not delta:
+                            continue
+                        pieces.append(delta)
+                        buffer = self._flush_sentences(buffer + delta, on_sentence)
+                    if buffer.strip():
+                        on_sentence(buffer.strip())
+                    response = "".join(pieces).strip()
+                    spoke_streamed = bool(response)
+                else:
+                    out = self.llama.create_chat_completion(
+                        messages=messages,
+                        max_tokens=50,
+                        temperature=0.7,
+                        top_p=0.9
+                    )
+                    response = out['choices'][0]['message']['content'].strip()
+                response = response.split('\n')[0].strip()
+
+                # If response is empty or too long, use fallback
+                if not response or len(response) > 200:
+                    response = fallback_response
+            except Exception as e:
+                print(f"LLM: Error generating response: {e}")
+                response = fallback_response
+        else:
+            try:
+                # Encode only the new turn; attention keys/values for the
+                # prompt and all previous turns live in self._past_key_values
+                if self._past_ids is None:
+                    # Rebuild from the rolling prompt parts: covers the
+                    # first turn and re-encoding after a KV-cache reset
+                    # without losing the recent exchanges
+                    new_text = "".join(
+                        [self.system_prompt, "\n\n"]
+                        + self._prompt_parts
+                        + [f"Intruder: {intruder_text}\nSecurity AI:"]
+                    )
+                else:
+                    new_text = f"Intruder: {intruder_text}\nSecurity AI:"
+                new_ids = self.tokenizer(new_text, return_tensors='pt').input_ids
+
+                if self._past_ids is not None:
+                    input_ids = torch.cat([self._past_ids, new_ids], dim=1)
+                else:
+                    input_ids = new_ids
+
+                gen_kwargs = dict(
+                    past_key_values=self._past_key_values,
+                    use_cache=True,
+                    return_dict_in_generate=True,
                     max_new_tokens=50,
-                    num_return_sequences=1,
-                    pad_token_id=self.generator.tokenizer.eos_token_id
+                    do_sample=True,
+                    temperature=0.7,
+                    top_p=0.9,
+                    pad_token_id=self.tokenizer.eos_token_id
                 )
-                
-                # Extract the response
-                full_response = outputs[0]['generated_text']
-                response = full_response.split("Security AI:")[-1].strip()
-                
-                # Clean up the response
-                response = response.split('\n')[0].strip()
-                
+
+                if on_sentence is not None:
+                    # Generate in a helper thread and consume the token
+                    # stream here, speaking each completed sentence
+                    streamer = TextIteratorStreamer(
+                        self.tokenizer, skip_prompt=True, skip_special_tokens=True
+                    )
+                    result = {}
+
+                    def _run_generate():
+                        with torch.no_grad():
+                            result['outputs'] = self.model.generate(
+                                input_ids, streamer=streamer, **gen_kwargs
+                            )
+
+                    gen_thread = threading.Thread(target=_run_generate, daemon=True)
+                    gen_thread.start()
+
+                    buffer = ""
+                    streamed = []
+                    for piece in streamer:
+                        streamed.append(piece)
+                        buffer = self._flush_sentences(buffer + piece, on_sentence)
+                    if buffer.strip():
+                        on_sentence(buffer.strip())
+                    gen_thread.join()
+                    outputs = result['outputs']
+                    spoke_streamed = bool("".join(streamed).strip())
+                else:
+                    with torch.no_grad():
+                        outputs = self.model.generate(input_ids, **gen_kwargs)
+
+                # Keep the cache for the next turn; reset before the context
+                # window fills up
+                self._past_ids = outputs.sequences
+                self._past_key_values = outputs.past_key_values
+                if self._past_ids.shape[1] > 900:
+                    self._reset_kv_cache()
+
+                # Extract and clean up the newly generated tokens
+                response_ids = outputs.sequences[0, input_ids.shape[1]:]
+                response = self.tokenizer.decode(response_ids, skip_special_tokens=True)
+                response = response.split("Intruder:")[0].split('\n')[0].strip()
+
                 # If response is empty or too long, use fallback
                 if not response or len(response) > 200:
-                    response = self._get_fallback_response(intruder_text)
-                    
+                    response = fallback_response
+
             except Exception as e:
                 print(f"LLM: Error generating response: {e}")
-                response = self._get_fallback_response(intruder_text)
-        
+                response = fallback_response
+
+        # Speak non-streamed replies (fallback or non-streaming path) whole
+        if on_sentence is not None and not spoke_streamed:
+            on_sentence(response)
+
+        # Extend the rolling prompt, trimming to the last 3 exchanges
+        self._prompt_parts.append(f"Intruder: {intruder_text}\n")
+        self._prompt_parts.append(f"Security AI: {response}\n")
+        del self._prompt_parts[:-6]
+
         # Add AI's response to history
         self.conversation_history.append({
             'role': 'assistant',
@@ -189,7 +382,9 @@ Keep responses SHORT (1-2 sentences max) and conversational. Be direct and clear
         """
         self.conversation_active = True
         self.conversation_history = []
-        
+        self._prompt_parts = []
+        self._reset_kv_cache()
+
         # Initial greeting/warning
         opening = "Attention! I have detected an unknown person. Please identify yourself immediately."
         
@@ -201,23 +396,29 @@ Keep responses SHORT (1-2 sentences max) and conversational. Be direct and clear
         print(f"LLM: Started conversation with intruder")
         return opening
     
-    def process_intruder_response(self, intruder_text: str) -> str:
+    def process_intruder_response(self, intruder_text: str, on_sentence=None) -> str:
         """
         Process the intruder's response and generate an AI reply.
-        
+
         Args:
             intruder_text: What the intruder said
-            
+            on_sentence: Optional callback receiving each completed sentence
+                        as it is generated (e.g. text_to_speech_async), so
+                        speech starts before the full reply is ready
+
         Returns:
             The AI's response
         """
         if not self.conversation_active:
-            return self.start_conversation()
-        
+            opening = self.start_conversation()
+            if on_sentence is not None:
+                on_sentence(opening)
+            return opening
+
         print(f"LLM: Processing intruder response: '{intruder_text}'")
-        response = self._generate_response(intruder_text)
+        response = self._generate_response(intruder_text, on_sentence=on_sentence)
         print(f"LLM: Generated response: '{response}'")
-        
+
         return response
     
     def end_conversation(self):
@@ -1,10 +1,14 @@
 import cv2
 import os
 import face_recognition
+import numpy as np
 import time
 import threading
-from queue import Queue
-from face_recognition_system import load_known_faces, recognize_face
+import multiprocessing
+from multiprocessing import shared_memory
+from queue import Queue, Empty, Full
+from face_recognition_system import load_known_faces, recognize_faces
+from image_utils import NUMBA_AVAILABLE, resize_bgr2rgb_box4
 from asr import ASRListener
 from tts import intimidate_intruder, text_to_speech_async
 from llm import IntruderConversationManager
@@ -14,47 +18,190 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
 import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
+# Use dlib's CNN detector (GPU-accelerated) instead of HOG when dlib was
+# built with CUDA
+try:
+    import dlib
+    CUDA_DETECTOR = dlib.DLIB_USE_CUDA
+except ImportError:
+    CUDA_DETECTOR = False
+
+# OpenCV's YuNet face detector runs as a small SIMD-optimized conv net,
+# far faster than dlib HOG on CPU; used when its ONNX weights are shipped
+# next to the scripts (download from the opencv_zoo repository)
+YUNET_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "face_detection_yunet_2023mar.onnx"
+)
+YUNET_AVAILABLE = hasattr(cv2, 'FaceDetectorYN') and os.path.exists(YUNET_MODEL_PATH)
+
+# Minimum per-pixel brightness change (0-255) that counts as motion
+MOTION_THRESHOLD = 24
+
+# Overlay drawing constants, hoisted out of the per-face draw loop
+FONT = cv2.FONT_HERSHEY_DUPLEX
+BOX_COLOR = (0, 0, 255)
+LABEL_TEXT_COLOR = (255, 255, 255)
+
 def recognize_faces_worker(frame_queue, result_queue, known_faces):
     """
     Worker thread function to perform face recognition on frames from a queue.
     """
+    rgb_buf = None  # preallocated downscaled-RGB scratch, reused across frames
+    prev_gray = None  # previous downscaled frame in grayscale, for motion gating
+    last_result = []  # most recent recognition result, reused for static frames
+    yunet = None  # lazily created YuNet detector (needs the frame size)
     while True:
         frame = frame_queue.get()
         if frame is None:  # Sentinel to stop the thread
             break
 
-        # Resize frame of video to 1/4 size for faster face recognition processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+        # Resize frame of video to 1/4 size for faster face recognition
+        # processing. 4x is an exact integer factor, so with Numba present
+        # a shape-specialized kernel does a 4x4 box average fused with the
+        # BGR->RGB swap (face_recognition wants RGB) in a single compiled
+        # pass; otherwise a strided slice (nearest-neighbor) does it with
+        # no interpolation arithmetic. Either way the result lands in a
+        # buffer allocated once and kept warm in cache instead of a fresh
+        # allocation per frame
+        if NUMBA_AVAILABLE:
+            out_shape = (frame.shape[0] // 4, frame.shape[1] // 4, 3)
+            if rgb_buf is None or rgb_buf.shape != out_shape:
+                rgb_buf = np.empty(out_shape, dtype=np.uint8)
+            resize_bgr2rgb_box4(frame, rgb_buf)
+        else:
+            small_view = frame[::4, ::4, ::-1]
+            if rgb_buf is None or rgb_buf.shape != small_view.shape:
+                rgb_buf = np.empty(small_view.shape, dtype=np.uint8)
+            np.copyto(rgb_buf, small_view)
+        rgb_small_frame = rgb_buf
 
-        # Convert the image from BGR color (which OpenCV uses) to RGB color (which face_recognition uses)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        # Motion gate: HOG cost scales with the pixels it scans, and most
+        # frames from a stationary security camera are static. When nothing
+        # changed since the last frame, skip detection entirely and repeat
+        # the previous result; when something did, restrict detection to
+        # the bounding box of the changed pixels (plus a margin so a face
+        # straddling the edge is still found)
+        gray = cv2.cvtColor(rgb_small_frame, cv2.COLOR_RGB2GRAY)
+        roi_top = 0
+        roi_left = 0
+        detect_frame = rgb_small_frame
+        if prev_gray is not None and prev_gray.shape == gray.shape:
+            diff = cv2.absdiff(gray, prev_gray)
+            prev_gray = gray
+            if int(diff.max()) < MOTION_THRESHOLD:
+                result_queue.put(last_result)
+                continue
+            moving = cv2.findNonZero((diff >= MOTION_THRESHOLD).astype(np.uint8))
+            if moving is not None:
+                x, y, w, h = cv2.boundingRect(moving)
+                pad = 16
+                roi_top = max(y - pad, 0)
+                roi_left = max(x - pad, 0)
+                detect_frame = np.ascontiguousarray(
+                    rgb_small_frame[roi_top:y + h + pad, roi_left:x + w + pad]
+                )
+        else:
+            prev_gray = gray
 
         # Find all the faces and face encodings in the current frame of video
-        face_locations = face_recognition.face_locations(rgb_small_frame, model="hog")  # HOG is faster than CNN
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        if CUDA_DETECTOR:
+            face_locations = face_recognition.face_locations(
+                detect_frame, number_of_times_to_upsample=0, model="cnn"
+            )
+        elif YUNET_AVAILABLE:
+            h, w = detect_frame.shape[:2]
+            if yunet is None:
+                backend = cv2.dnn.DNN_BACKEND_DEFAULT
+                target = cv2.dnn.DNN_TARGET_CPU
+                try:
+                    if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                        backend = cv2.dnn.DNN_BACKEND_CUDA
+                        target = cv2.dnn.DNN_TARGET_CUDA
+                except (AttributeError, cv2.error):
+                    pass
+                yunet = cv2.FaceDetectorYN.create(
+                    YUNET_MODEL_PATH, "", (w, h), 0.8, 0.3, 5000, backend, target
+                )
+            yunet.setInputSize((w, h))
+            # YuNet wants BGR; detect_frame is the RGB copy made for the
+            # encoder, so swap channels for the detector only
+            _, detections = yunet.detect(cv2.cvtColor(detect_frame, cv2.COLOR_RGB2BGR))
+            face_locations = []
+            if detections is not None:
+                for x, y, bw, bh in detections[:, :4].astype(int):
+                    top = max(y, 0)
+                    left = max(x, 0)
+                    face_locations.append((top, min(x + bw, w), min(y + bh, h), left))
+        else:
+            face_locations = face_recognition.face_locations(detect_frame, model="hog")  # HOG is faster than CNN on CPU
+        face_encodings = face_recognition.face_encodings(detect_frame, face_locations)
 
         recognized_faces = []
-        # Loop through each face in this frame of video
-        for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-            # See if the face is a match for the known face(s)
-            name = "Unknown"
-            if known_faces:
-                for person_name, encodings in known_faces.items():
-                    matches = face_recognition.compare_faces(encodings, face_encoding, tolerance=0.6)
-                    if any(matches):
-                        name = person_name
-                        break
-            
-            # Scale back up face locations since the frame we detected in was scaled to 1/4 size
-            top *= 4
-            right *= 4
-            bottom *= 4
-            left *= 4
-            recognized_faces.append(((top, right, bottom, left), name))
-        
+        if face_encodings:
+            # Match all faces in the frame in one batched distance pass
+            names = recognize_faces(face_encodings, known_faces)
+            for (top, right, bottom, left), name in zip(face_locations, names):
+                # Shift ROI-relative coordinates back to the small frame,
+                # then scale up since detection ran at 1/4 size
+                top = (top + roi_top) * 4
+                right = (right + roi_left) * 4
+                bottom = (bottom + roi_top) * 4
+                left = (left + roi_left) * 4
+                recognized_faces.append(((top, right, bottom, left), name))
+
+        last_result = recognized_faces
         result_queue.put(recognized_faces)
-        # Small delay to give CPU time to other threads (ASR)
-        time.sleep(1)
+        # No artificial delay here: frame_queue.get() blocks (yielding the
+        # CPU) until the producer supplies the next frame, and the producer
+        # already throttles via process_every_n_frames
+
+
+class _SharedFrameQueue:
+    """
+    Adapter exposing the get() interface recognize_faces_worker expects,
+    backed by a single shared-memory frame slot instead of a Queue. The
+    producer writes frame bytes into the slot and sets frame_ready; the
+    worker copies them out, releases the slot, and hands the copy to the
+    recognition loop. A set stop_event plays the role of the None sentinel.
+    """
+
+    def __init__(self, frame_view, frame_ready, slot_free, stop_event):
+        self.frame_view = frame_view
+        self.frame_ready = frame_ready
+        self.slot_free = slot_free
+        self.stop_event = stop_event
+
+    def get(self):
+        while True:
+            if not self.frame_ready.wait(timeout=0.5):
+                if self.stop_event.is_set():
+                    return None
+                continue
+            self.frame_ready.clear()
+            if self.stop_event.is_set():
+                return None
+            frame = self.frame_view.copy()
+            self.slot_free.set()
+            return frame
+
+
+def recognize_faces_worker_process(shm_name, frame_shape, frame_ready, slot_free,
+                                   stop_event, result_queue, known_faces):
+    """
+    Entry point for the worker when it runs as a separate process. Attaches
+    to the shared-memory frame slot and runs the same recognition loop as
+    the thread worker, but on its own interpreter so the Python-level work
+    around detection (resize copy, motion gate, result assembly) no longer
+    contends with the main loop for the GIL.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frame_view = np.ndarray(frame_shape, dtype=np.uint8, buffer=shm.buf)
+        frame_queue = _SharedFrameQueue(frame_view, frame_ready, slot_free, stop_event)
+        recognize_faces_worker(frame_queue, result_queue, known_faces)
+    finally:
+        shm.close()
+
 
 def run_live_recognition(known_faces):
     """
@@ -68,21 +215,61 @@ def run_live_recognition(known_faces):
         return
 
     video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
-    
-    frame_queue = Queue(maxsize=1)
-    result_queue = Queue(maxsize=1)
-
-    # Start the face recognition worker thread
-    recognition_thread = threading.Thread(
-        target=recognize_faces_worker,
-        args=(frame_queue, result_queue, known_faces)
-    )
-    recognition_thread.daemon = True
-    recognition_thread.start()
-
-    # Initialize ASR listener
+
+    # Read one frame up-front so the shared-memory slot can be sized to
+    # the camera's actual resolution
+    ret, first_frame = video_capture.read()
+    if not ret:
+        print("Error: Can't receive frame (stream end?). Exiting ...")
+        video_capture.release()
+        return
+
+    # Prefer running the worker as a separate process: dlib releases the
+    # GIL, but the Python around it (motion gate, buffer copies, result
+    # assembly) still contends with this loop's drawing and ASR polling
+    # when run as a thread. Frames cross over through a shared-memory slot
+    # with no serialization; results are small and use a regular
+    # multiprocessing queue. Falls back to the thread worker if the
+    # process cannot be started
+    use_process_worker = False
+    frame_shm = None
+    try:
+        frame_shm = shared_memory.SharedMemory(create=True, size=first_frame.nbytes)
+        frame_slot = np.ndarray(first_frame.shape, dtype=np.uint8, buffer=frame_shm.buf)
+        frame_ready = multiprocessing.Event()
+        slot_free = multiprocessing.Event()
+        slot_free.set()
+        stop_event = multiprocessing.Event()
+        result_queue = multiprocessing.Queue()
+        recognition_worker = multiprocessing.Process(
+            target=recognize_faces_worker_process,
+            args=(frame_shm.name, first_frame.shape, frame_ready, slot_free,
+                  stop_event, result_queue, known_faces),
+            daemon=True,
+        )
+        recognition_worker.start()
+        use_process_worker = True
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Could not start recognition process ({e}); using a thread instead.")
+        if frame_shm is not None:
+            frame_shm.close()
+            frame_shm.unlink()
+            frame_shm = None
+        frame_queue = Queue(maxsize=1)
+        result_queue = Queue(maxsize=1)
+        recognition_worker = threading.Thread(
+            target=recognize_faces_worker,
+            args=(frame_queue, result_queue, known_faces)
+        )
+        recognition_worker.daemon = True
+        recognition_worker.start()
+
+    # Initialize ASR listener. Transcripts arrive at speech rate (seconds
+    # apart), so they are delivered via callback into a local queue instead
+    # of having this loop call has_text() (method call + lock) every frame
+    asr_queue = Queue()
     asr_listener = ASRListener()
-    asr_listener.start_listening()
+    asr_listener.start_listening(on_text=asr_queue.put)
 
     # Initialize conversation manager for intruders
     conversation_manager = IntruderConversationManager()
@@ -102,23 +289,45 @@ def run_live_recognition(known_faces):
     RESET = '\033[0m'
     BOLD = '\033[1m'
 
+    frame = first_frame
     while True:
-        # Capture frame-by-frame
-        ret, frame = video_capture.read()
-        if not ret:
-            print("Error: Can't receive frame (stream end?). Exiting ...")
-            break
-
         frame_count += 1
-        
-        # Put the frame in the queue for the worker thread to process (but not every frame)
-        if frame_count % process_every_n_frames == 0:
-            if not frame_queue.full():
-                frame_queue.put(frame)
-
-        # Check for results from the worker thread
-        if not result_queue.empty():
-            recognized_faces = result_queue.get()
+
+        # Only decode the frames the worker can actually consume; for the
+        # rest, grab() advances the stream header-only with no MJPG/YUV
+        # decode, and drawing reuses the most recent decoded frame
+        if frame_count % process_every_n_frames != 0 and frame is not None:
+            if not video_capture.grab():
+                print("Error: Can't receive frame (stream end?). Exiting ...")
+                break
+        else:
+            ret, frame = video_capture.read()
+            if not ret:
+                print("Error: Can't receive frame (stream end?). Exiting ...")
+                break
+
+            # Hand the decoded frame to the worker; if it is still busy
+            # with the previous frame, drop this one (the same latest-frame
+            # policy as the maxsize-1 queue on the thread path)
+            if use_process_worker:
+                if slot_free.is_set() and frame.shape == frame_slot.shape:
+                    slot_free.clear()
+                    np.copyto(frame_slot, frame)
+                    frame_ready.set()
+            else:
+                # put_nowait avoids the check-then-act race of full()+put
+                # and costs one call instead of two
+                try:
+                    frame_queue.put_nowait(frame)
+                except Full:
+                    pass
+
+        # Drain any pending results from the worker thread in one pass
+        while True:
+            try:
+                recognized_faces = result_queue.get_nowait()
+            except Empty:
+                break
         
         # Guard mode: Check for unknown faces
         if guard_mode:
@@ -142,14 +351,19 @@ def run_live_recognition(known_faces):
 
         # Draw the results on the frame and display only when guard mode is active
         if guard_mode:
-            for (top, right, bottom, left), name in recognized_faces:
-                # Draw a box around the face
-                cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+            if recognized_faces:
+                # Draw every face box in a single polylines dispatch rather
+                # than one rectangle call per face
+                boxes = np.array([
+                    [[left, top], [right, top], [right, bottom], [left, bottom]]
+                    for (top, right, bottom, left), _ in recognized_faces
+                ])
+                cv2.polylines(frame, boxes, isClosed=True, color=BOX_COLOR, thickness=2)
 
-                # Draw a label with a name below the face
-                cv2.rectangle(frame, (left, bottom - 35), (right, bottom), (0, 0, 255), cv2.FILLED)
-                font = cv2.FONT_HERSHEY_DUPLEX
-                cv2.putText(frame, name, (left + 6, bottom - 6), font, 1.0, (255, 255, 255), 1)
+                # Label backgrounds are filled, so they stay per-face
+                for (top, right, bottom, left), name in recognized_faces:
+                    cv2.rectangle(frame, (left, bottom - 35), (right, bottom), BOX_COLOR, cv2.FILLED)
+                    cv2.putText(frame, name, (left + 6, bottom - 6), FONT, 1.0, LABEL_TEXT_COLOR, 1)
 
             # Display the resulting image only in guard mode
             cv2.imshow('Video', frame)
@@ -167,16 +381,22 @@ def run_live_recognition(known_faces):
             time.sleep(0.1)
 
         # Check for speech input from ASR
-        if asr_listener.has_text():
-            spoken_text = asr_listener.get_text()
+        try:
+            spoken_text = asr_queue.get_nowait()
+        except Empty:
+            spoken_text = None
+        if spoken_text is not None:
             print(f"{YELLOW}[VOICE COMMAND]: {spoken_text}{RESET}")
             
             # If in conversation mode, treat this as intruder response
             if conversation_mode:
                 print(f"{RED}[INTRUDER]: {spoken_text}{RESET}")
-                ai_response = conversation_manager.process_intruder_response(spoken_text)
+                # Sentences are handed to TTS as they stream out of the
+                # model, so speech starts before generation finishes
+                ai_response = conversation_manager.process_intruder_response(
+                    spoken_text, on_sentence=text_to_speech_async
+                )
                 print(f"{GREEN}[SECURITY AI]: {ai_response}{RESET}")
-                text_to_speech_async(ai_response)
                 # Reset conversation timeout
                 conversation_timeout = time.time() + 60
             else:
@@ -220,9 +440,16 @@ def run_live_recognition(known_faces):
     # Stop ASR listener
     asr_listener.stop_listening()
 
-    # Signal the worker thread to stop and wait for it
-    frame_queue.put(None)
-    recognition_thread.join()
+    # Signal the worker to stop and wait for it
+    if use_process_worker:
+        stop_event.set()
+        frame_ready.set()
+        recognition_worker.join(timeout=2)
+        frame_shm.close()
+        frame_shm.unlink()
+    else:
+        frame_queue.put(None)
+        recognition_worker.join()
 
     # Release handle to the webcam
     video_capture.release()
@@ -233,8 +460,8 @@ if __name__ == "__main__":
     dataset_path = os.path.join(script_dir, "dataset")
     
     known_faces = load_known_faces(dataset_path)
-    
-    if not known_faces:
+
+    if known_faces['matrix'].shape[0] == 0:
         print("No known faces loaded. Please check the dataset directory.")
     else:
         run_live_recognition(known_faces)
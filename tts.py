@@ -1,17 +1,46 @@
 from gtts import gTTS
 import pygame
 import os
+import random
 import tempfile
 import threading
 import time
+from queue import Queue
+
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+    print("Warning: pyttsx3 not available. Falling back to gTTS (network).")
 
 # Global flag to indicate when TTS is speaking
 is_speaking = False
 speaking_lock = threading.Lock()
 
+# Texts queued for speech. A single worker thread drains this queue, so
+# sentences streamed from the LLM play back to back instead of each new
+# sentence's playback cutting off the previous one, and is_speaking stays
+# set from the first enqueue until the last queued text finishes
+_speech_queue = Queue()
+_speech_thread = None
+_speech_thread_lock = threading.Lock()
+
 # Initialize pygame mixer for audio playback
 pygame.mixer.init()
 
+# On-device synthesizer: no network round-trip, no MP3 tempfile/decode.
+# gTTS remains the fallback when pyttsx3 (or its espeak backend) is missing
+_engine = None
+_engine_lock = threading.Lock()
+if PYTTSX3_AVAILABLE:
+    try:
+        _engine = pyttsx3.init()
+        _engine.setProperty('rate', 170)
+    except Exception as e:
+        print(f"TTS: Could not initialize local engine ({e}). Falling back to gTTS.")
+        _engine = None
+
 def is_tts_speaking():
     """
     Check if TTS is currently speaking.
@@ -23,105 +52,179 @@ def is_tts_speaking():
     with speaking_lock:
         return is_speaking
 
+def _speak_blocking(text):
+    """
+    Synthesize one text and play it, returning when playback has finished.
+    Does not touch is_speaking; callers manage the flag around this. Uses
+    the local pyttsx3 engine when available (synthesis in milliseconds, no
+    HTTP round-trip); otherwise falls back to gTTS + pygame.
+    """
+    print(f"TTS module: Synthesizing speech for text: '{text}'")
+
+    if _engine is not None:
+        with _engine_lock:
+            _engine.say(text)
+            _engine.runAndWait()
+        return
+
+    # Create a temporary file for the audio
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
+        temp_file = fp.name
+    try:
+        # Generate speech
+        gTTS(text=text, lang='en', slow=False).save(temp_file)
+
+        # Load and play the audio, waiting for it to finish
+        pygame.mixer.music.load(temp_file)
+        pygame.mixer.music.play()
+        while pygame.mixer.music.get_busy():
+            time.sleep(0.1)
+    finally:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+
+
+def _clear_if_idle():
+    """
+    Clear is_speaking unless more texts are waiting in the speech queue.
+    """
+    global is_speaking
+    with speaking_lock:
+        if _speech_queue.unfinished_tasks == 0:
+            is_speaking = False
+
+
+def _speech_worker():
+    """
+    Single consumer for the speech queue: speaks queued texts one after
+    another, so the ASR feedback gate stays closed for the whole of a
+    multi-sentence reply.
+    """
+    while True:
+        text = _speech_queue.get()
+        try:
+            _speak_blocking(text)
+        except Exception as e:
+            print(f"TTS Error: {e}")
+        _speech_queue.task_done()
+        _clear_if_idle()
+
+
+def _ensure_speech_worker():
+    global _speech_thread
+    with _speech_thread_lock:
+        if _speech_thread is None:
+            _speech_thread = threading.Thread(target=_speech_worker, daemon=True)
+            _speech_thread.start()
+
+
 def text_to_speech(text, blocking=True):
     """
-    Convert text to speech using gTTS and play it using pygame.
-    
+    Convert text to speech and play it.
+
     Args:
         text: The text to convert to speech
-        blocking: If True, waits for speech to complete. If False, plays in background.
-    
+        blocking: If True, waits for speech to complete. If False, queues
+                  the text for the background speech worker.
+
     Returns:
         True if successful, False otherwise
     """
     global is_speaking
-    
+
+    if not blocking:
+        return text_to_speech_async(text)
+
+    with speaking_lock:
+        is_speaking = True
     try:
-        print(f"TTS module: Synthesizing speech for text: '{text}'")
-        
-        # Set speaking flag
-        with speaking_lock:
-            is_speaking = True
-        
-        # Create a temporary file for the audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
-            temp_file = fp.name
-        
-        # Generate speech
-        tts = gTTS(text=text, lang='en', slow=False)
-        tts.save(temp_file)
-        
-        # Load and play the audio
-        pygame.mixer.music.load(temp_file)
-        pygame.mixer.music.play()
-        
-        if blocking:
-            # Wait for the audio to finish playing
-            while pygame.mixer.music.get_busy():
-                time.sleep(0.1)
-            
-            # Clear speaking flag
-            with speaking_lock:
-                is_speaking = False
-        
-        # Clean up the temporary file (after a delay if non-blocking)
-        if blocking:
-            try:
-                os.remove(temp_file)
-            except:
-                pass
-        else:
-            # Schedule cleanup after audio finishes for non-blocking
-            def cleanup():
-                # Wait for audio to finish
-                while pygame.mixer.music.get_busy():
-                    time.sleep(0.1)
-                
-                # Clear speaking flag
-                with speaking_lock:
-                    is_speaking = False
-                
-                # Remove temp file
-                time.sleep(1)
-                try:
-                    os.remove(temp_file)
-                except:
-                    pass
-            threading.Thread(target=cleanup, daemon=True).start()
-        
+        _speak_blocking(text)
         return True
-        
     except Exception as e:
         print(f"TTS Error: {e}")
         return False
+    finally:
+        _clear_if_idle()
 
 
 def text_to_speech_async(text):
     """
-    Convert text to speech in a background thread (non-blocking).
+    Queue text for the background speech worker (non-blocking). Queued
+    texts play in order without interrupting one another; is_speaking
+    stays set until the last of them has finished.
     """
-    def _speak():
-        text_to_speech(text, blocking=True)
-    
-    thread = threading.Thread(target=_speak, daemon=True)
-    thread.start()
+    global is_speaking
+    _ensure_speech_worker()
+    with speaking_lock:
+        is_speaking = True
+        _speech_queue.put(text)
     return True
 
 
+INTIMIDATION_MESSAGES = [
+    "Alert! Unknown person detected. This area is under surveillance.",
+    "Warning! You are being recorded. Please identify yourself.",
+    "Security breach detected. Authorities have been notified.",
+    "This is a restricted area. Leave immediately or face consequences."
+]
+
+# Decoded audio for the fixed message set, synthesized once on first use so
+# the gTTS network call and MP3 decode never sit on the alert hot path
+_intimidation_clips = None
+
+
+def _ensure_intimidation_clips():
+    """
+    Synthesize and decode each intimidation message once, returning the
+    cached pygame Sound objects.
+    """
+    global _intimidation_clips
+    if _intimidation_clips is not None:
+        return _intimidation_clips
+    clips = []
+    for message in INTIMIDATION_MESSAGES:
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.mp3') as fp:
+                temp_file = fp.name
+            gTTS(text=message, lang='en', slow=False).save(temp_file)
+            clips.append(pygame.mixer.Sound(temp_file))
+            os.remove(temp_file)
+        except Exception as e:
+            print(f"TTS: Could not pre-synthesize intimidation clip: {e}")
+    _intimidation_clips = clips
+    return clips
+
+
 def intimidate_intruder():
     """
     Play an intimidating message to scare away intruders.
+    Uses the pre-synthesized clip cache on the gTTS path; with the local
+    engine, synthesis is already millisecond-fast so no cache is needed.
     """
-    messages = [
-        "Alert! Unknown person detected. This area is under surveillance.",
-        "Warning! You are being recorded. Please identify yourself.",
-        "Security breach detected. Authorities have been notified.",
-        "This is a restricted area. Leave immediately or face consequences."
-    ]
-    
-    import random
-    message = random.choice(messages)
+    global is_speaking
     print(f"TTS: Playing intimidation message...")
+
+    if _engine is None:
+        clips = _ensure_intimidation_clips()
+        if clips:
+            clip = random.choice(clips)
+            with speaking_lock:
+                is_speaking = True
+            channel = clip.play()
+
+            def _clear_when_done():
+                global is_speaking
+                while channel is not None and channel.get_busy():
+                    time.sleep(0.1)
+                with speaking_lock:
+                    is_speaking = False
+
+            threading.Thread(target=_clear_when_done, daemon=True).start()
+            return True
+
+    message = random.choice(INTIMIDATION_MESSAGES)
     return text_to_speech_async(message)
 
 